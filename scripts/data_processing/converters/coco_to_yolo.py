@@ -5,8 +5,23 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional
 import logging
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from .base_converter import BaseConverter
 
+# orjson 为可选依赖, 解析大型COCO标注文件时比标准库json快数倍, 未安装时回退到json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _load_json(json_file: Path) -> Dict[str, Any]:
+    if orjson is not None:
+        with open(json_file, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 class CocoToYoloConverter(BaseConverter):
     """COCO JSON格式转YOLO TXT格式转换器"""
     
@@ -45,12 +60,12 @@ class CocoToYoloConverter(BaseConverter):
         for i, json_file in enumerate(json_files, 1):
             print(f"   [{i}/{len(json_files)}] 处理文件: {json_file.name}")
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = _load_json(json_file)
+                categories = data.get('categories', [])
                 print(f"      - 图像数量: {len(data.get('images', []))}")
                 print(f"      - 标注数量: {len(data.get('annotations', []))}")
-                print(f"      - 类别数量: {len(data.get('categories', []))}")
-                for category in data.get('categories', []):
+                print(f"      - 类别数量: {len(categories)}")
+                for category in categories:
                     cat_name = category['name']
                     if cat_name not in category_id_mapping:
                         category_id_mapping[cat_name] = next_category_id
@@ -60,14 +75,11 @@ class CocoToYoloConverter(BaseConverter):
                         })
                         print(f"      - 新类别: {cat_name} (ID: {next_category_id})")
                         next_category_id += 1
+                # 原类别ID -> 类别名, 每条标注一次字典查找; 倒序构建使重复ID时与原先一样取第一个类别
+                original_id_to_name = {cat['id']: cat['name'] for cat in reversed(categories)}
                 merged_data['images'].extend(data.get('images', []))
                 for ann in data.get('annotations', []):
-                    original_cat_id = ann['category_id']
-                    cat_name = None
-                    for cat in data.get('categories', []):
-                        if cat['id'] == original_cat_id:
-                            cat_name = cat['name']
-                            break
+                    cat_name = original_id_to_name.get(ann['category_id'])
                     if cat_name:
                         ann['category_id'] = category_id_mapping[cat_name]
                         merged_data['annotations'].append(ann)
@@ -131,15 +143,15 @@ class CocoToYoloConverter(BaseConverter):
                 imgid_to_lines[image_id].append(line)
                 converted_annotations += 1
                 converted_files.add(txt_filename)
-            # 直接在输出目录生成txt（无目标则为空）
+            # 直接在输出目录生成txt（无目标则为空）, 先汇总内容再并发写入, 重叠文件打开/关闭的系统调用
+            payloads = []
             for img in coco_data['images']:
                 img_filename = img['file_name']
                 txt_filename = Path(img_filename).stem + '.txt'
-                txt_path = output_path / txt_filename
-                lines = imgid_to_lines.get(img['id'], [])
-                with open(txt_path, 'w', encoding='utf-8') as f:
-                    f.writelines(lines)
+                payloads.append((output_path / txt_filename, ''.join(imgid_to_lines.get(img['id'], []))))
                 converted_files.add(txt_filename)
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                list(executor.map(lambda item: item[0].write_text(item[1], encoding='utf-8'), payloads))
             # 保存类别名称文件
             classes_file = output_path / 'classes.txt'
             with open(classes_file, 'w', encoding='utf-8') as f:
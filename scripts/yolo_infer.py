@@ -1,17 +1,32 @@
 import os
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
 from datetime import datetime
 from ultralytics import YOLO
 from pathlib import Path
 
-def setup_logging(base_path, log_type='infer', temp_log=True):
+# 共享同一个Formatter, 日志由后台QueueListener线程写入文件, 调用方只需入队
+_FMT = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_LISTENER = None
+
+def setup_logging(base_path, timestamp, log_type='infer', temp_log=True):
+    global _LISTENER
     log_dir = Path(base_path) / 'logging' / log_type
     log_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file_name = f'temp-{timestamp}-{log_type}.log' if temp_log else f'{log_type}{timestamp}.log'
     log_file_path = log_dir / log_file_name
-    logging.basicConfig(filename=log_file_path, level=logging.INFO, encoding='utf-8-sig',
-                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if _LISTENER is None:
+        file_handler = logging.FileHandler(log_file_path, encoding='utf-8-sig')
+        file_handler.setFormatter(_FMT)
+        log_queue = Queue(-1)
+        _LISTENER = QueueListener(log_queue, file_handler)
+        _LISTENER.start()
+        atexit.register(_LISTENER.stop)
+        root_logger = logging.getLogger()
+        root_logger.setLevel(logging.INFO)
+        root_logger.addHandler(QueueHandler(log_queue))
     return log_file_path
 
 def load_model(base_path, weights='models/checkpoints/trainN-20250614_200001-yolov8n-best.pt'):
@@ -19,8 +34,7 @@ def load_model(base_path, weights='models/checkpoints/trainN-20250614_200001-yol
     model = YOLO(str(weights_path))
     return model
 
-def infer_model(model, source, base_path):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+def infer_model(model, source, base_path, timestamp):
     infer_dir = Path(base_path) / 'runs/infer' / f'inferN-{timestamp}'
     infer_dir.mkdir(parents=True, exist_ok=True)
     results = model(source, save=True, save_txt=True, project=str(infer_dir))
@@ -28,11 +42,13 @@ def infer_model(model, source, base_path):
 
 def yolo_infer():
     base_path = 'MedicalYOLO'
-    log_file_path = setup_logging(base_path)
+    # 整个运行只生成一次时间戳, 保证日志与输出目录名一致
+    run_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file_path = setup_logging(base_path, run_ts)
     model = load_model(base_path)
     source = 'data/raw/images'
     logging.info(f"Inference started on {source}")
-    results = infer_model(model, source, base_path)
+    results = infer_model(model, source, base_path, run_ts)
     logging.info(f"Inference completed. Results saved to {results[0].save_dir}")
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+import argparse
+import json
+import logging
+import random
+from pathlib import Path
+
+import numpy as np
+import onnx
+from PIL import Image
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+from ultralytics import YOLO
+
+# CPU 部署用的 ONNX Runtime 静态 INT8 量化(QDQ 格式), 先导出 FP32 动态形状 ONNX 并重命名为 <权重>-fp32-dynamic.onnx:
+# yolo export model=models/checkpoints/<权重>.pt format=onnx imgsz=640 simplify=True dynamic=True
+# (不要与 medical_app 在 GPU 上使用的 FP16 静态导出 <权重>-fp16-static.onnx 混用)
+# 输出的 <权重>-int8.onnx 放在 .pt 同目录下, 同时在验证集上对比 FP32 与 INT8 的 mAP 并写入 <权重>-int8.json,
+# 只有精度下降在允许范围内(accepted 为 true)时, 无 GPU 且没有 OpenVINO 模型的 medical_app 才会加载 INT8 模型
+
+BASE_DIR = Path(__file__).parent.parent
+WEIGHTS = BASE_DIR / 'models/checkpoints/trainN-20250614_200001-yolov8n-best.pt'
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def letterbox(path, imgsz=640):
+    """
+    与 ultralytics 预处理一致: 等比缩放后用 114 灰色填充到 imgsz x imgsz, 返回 NCHW float32 [0, 1]
+    """
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+        scale = imgsz / max(img.size)
+        new_size = (round(img.width * scale), round(img.height * scale))
+        img = img.resize(new_size, Image.BILINEAR)
+        canvas = Image.new('RGB', (imgsz, imgsz), (114, 114, 114))
+        canvas.paste(img, ((imgsz - new_size[0]) // 2, (imgsz - new_size[1]) // 2))
+    arr = np.asarray(canvas, dtype=np.float32) / 255.0
+    return np.ascontiguousarray(arr.transpose(2, 0, 1)[None])
+
+
+class ImageCalibrationReader(CalibrationDataReader):
+    """
+    逐张读取校准图片, 不一次性把整个校准集载入内存
+    """
+
+    def __init__(self, image_paths, input_name, imgsz=640):
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iter = iter(image_paths)
+
+    def get_next(self):
+        path = next(self._iter, None)
+        if path is None:
+            return None
+        return {self.input_name: letterbox(path, self.imgsz)}
+
+
+def quantize(model_input, model_output, calib_dir, num_images=300, imgsz=640):
+    images = sorted(p for p in Path(calib_dir).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    if not images:
+        raise FileNotFoundError(f"校准目录中没有图片: {calib_dir}")
+    random.seed(0)
+    images = random.sample(images, min(num_images, len(images)))
+    logging.info(f"使用 {len(images)} 张图片进行 INT8 校准: {calib_dir}")
+
+    model = onnx.load(str(model_input))
+    input_name = model.graph.input[0].name
+    quantize_static(
+        str(model_input),
+        str(model_output),
+        ImageCalibrationReader(images, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        # 只量化卷积和矩阵乘; Detect 头末端的 Concat 把像素尺度的框坐标和 0~1 的类别分数拼在一起,
+        # 若与 Sigmoid/Mul 一起做 QDQ, 共用一个 per-tensor scale 会把类别分数量化成几乎全零
+        op_types_to_quantize=['Conv', 'MatMul'],
+    )
+
+    # ultralytics 从 metadata 中读取类别名、步长和输入尺寸, 量化后补回
+    quantized = onnx.load(str(model_output))
+    if not quantized.metadata_props:
+        quantized.metadata_props.extend(model.metadata_props)
+        onnx.save(quantized, str(model_output))
+    logging.info(f"INT8 模型已保存: {model_output}")
+    return model_output
+
+
+def evaluate(model_fp32, model_int8, data_yaml, imgsz=640, max_map_drop=0.01):
+    """
+    在验证集上对比 FP32 与 INT8 模型的 mAP, 结果写入与 INT8 模型同名的 .json, 供 medical_app 判断是否启用
+    """
+    metrics = {}
+    for name, path in (('fp32', model_fp32), ('int8', model_int8)):
+        box = YOLO(str(path), task='detect').val(data=str(data_yaml), imgsz=imgsz, batch=1, device='cpu', plots=False).box
+        metrics[name] = {'map50': float(box.map50), 'map50_95': float(box.map)}
+        logging.info(f"{name}: mAP50={box.map50:.4f}, mAP50-95={box.map:.4f}")
+    drop = metrics['fp32']['map50_95'] - metrics['int8']['map50_95']
+    record = {**metrics, 'map50_95_drop': drop, 'max_map_drop': max_map_drop, 'accepted': drop <= max_map_drop}
+    record_path = Path(model_int8).with_suffix('.json')
+    with open(record_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    if record['accepted']:
+        logging.info(f"INT8 模型 mAP50-95 下降 {drop:.4f}, 在允许范围内, 结果已记录: {record_path}")
+    else:
+        logging.warning(f"INT8 模型 mAP50-95 下降 {drop:.4f}, 超过允许值 {max_map_drop}, 服务端不会启用该模型: {record_path}")
+    return record
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="ONNX Runtime 静态 INT8 量化")
+    parser.add_argument('--model', default=str(WEIGHTS.with_name(f'{WEIGHTS.stem}-fp32-dynamic.onnx')),
+                        help="FP32 动态形状 ONNX 模型")
+    parser.add_argument('--output', default=str(WEIGHTS.with_name(f'{WEIGHTS.stem}-int8.onnx')),
+                        help="默认输出为 medical_app 读取的 <权重>-int8.onnx")
+    parser.add_argument('--calib-dir', default=str(BASE_DIR / 'yoloserver/media'))
+    parser.add_argument('--num-images', type=int, default=300)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--data', default=str(BASE_DIR / 'configs/data.yaml'), help="用于对比 mAP 的数据集配置")
+    parser.add_argument('--max-map-drop', type=float, default=0.01, help="允许的 mAP50-95 最大下降值")
+    args = parser.parse_args()
+
+    model_input = Path(args.model)
+    model_output = Path(args.output)
+    quantize(model_input, model_output, args.calib_dir, args.num_images, args.imgsz)
+    evaluate(model_input, model_output, args.data, args.imgsz, args.max_map_drop)
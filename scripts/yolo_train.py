@@ -8,17 +8,19 @@
 @Function : 训练脚本的入口,集成utils模块
 """
 import logging
+import os
+import torch
 from ultralytics import YOLO
 import argparse
+from datetime import datetime
 from pathlib import Path
 import sys
 
-current_path = Path(__file__).parent.parent.resolve()
-utils_path = current_path / 'utils'
-if str(current_path) not in sys.path:
-    sys.path.insert(0, str(current_path))
-if str(utils_path) not in sys.path:
-    sys.path.insert(1, str(utils_path))
+# 使用字符串路径拼接, 避免 Path.resolve() 逐级 stat 父目录
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _index, _path in enumerate((_ROOT, os.path.join(_ROOT, 'utils'))):
+    if _path not in sys.path:
+        sys.path.insert(_index, _path)
 
 from utils.logging_utils import setup_logger, rename_log_file, log_parameters
 from utils.performance_utils import time_it
@@ -44,10 +46,15 @@ def parse_args():
     return parser.parse_args()
 
 def run_training(model, yolo_args):
+    # 训练输入尺寸固定, 开启TF32矩阵乘法与cuDNN算法自动选择; deterministic模式下保留可复现性
+    if torch.cuda.is_available():
+        torch.set_float32_matmul_precision('high')
+        if not getattr(yolo_args, 'deterministic', False):
+            torch.backends.cudnn.benchmark = True
     result = model.train(**vars(yolo_args))
     return result
 
-def main(args, logger):
+def main(args, logger, run_ts):
     logger.info("YOLO 肿瘤检测训练脚本启动".center(80, "="))
     try:
         yaml_config = {}
@@ -93,7 +100,8 @@ def main(args, logger):
         # 复制检查点模型
         copy_checkpoint_models(Path(model.trainer.save_dir),
                               project_args.weights,
-                              CHECKPOINTS_DIR, logger)
+                              CHECKPOINTS_DIR, logger,
+                              date_str=run_ts)
 
         logger.info(f"YOLO 肿瘤检测训练脚本结束")
     except Exception as e:
@@ -102,12 +110,15 @@ def main(args, logger):
 
 if __name__ == "__main__":
     args_ = parse_args()
+    # 整个训练只生成一次时间戳, 日志与检查点文件名保持一致
+    run_ts = datetime.now().strftime("%Y%m%d-%H%M%S")
     logger = setup_logger(
         base_path=LOGS_DIR,
         log_type="train",
         model_name=args_.weights.replace(".pt", ""),
         log_level=logging.INFO,
         temp_log=True,
-        logger_name="YOLO_Training"
+        logger_name="YOLO_Training",
+        timestamp=run_ts
     )
-    main(args_, logger)
\ No newline at end of file
+    main(args_, logger, run_ts)
\ No newline at end of file
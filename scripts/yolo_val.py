@@ -1,19 +1,35 @@
 import os
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
 from datetime import datetime
 from ultralytics import YOLO
 import yaml
 from pathlib import Path
-import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image, ImageDraw
 
-def setup_logging(base_path, log_type='val', temp_log=True):
+# 共享同一个Formatter, 日志由后台QueueListener线程写入文件, 调用方只需入队
+_FMT = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_LISTENER = None
+
+def setup_logging(base_path, timestamp, log_type='val', temp_log=True):
+    global _LISTENER
     log_dir = Path(base_path) / 'logging' / log_type
     log_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file_name = f'temp-{timestamp}-{log_type}.log' if temp_log else f'{log_type}{timestamp}.log'
     log_file_path = log_dir / log_file_name
-    logging.basicConfig(filename=log_file_path, level=logging.INFO, encoding='utf-8-sig',
-                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if _LISTENER is None:
+        file_handler = logging.FileHandler(log_file_path, encoding='utf-8-sig')
+        file_handler.setFormatter(_FMT)
+        log_queue = Queue(-1)
+        _LISTENER = QueueListener(log_queue, file_handler)
+        _LISTENER.start()
+        atexit.register(_LISTENER.stop)
+        root_logger = logging.getLogger()
+        root_logger.setLevel(logging.INFO)
+        root_logger.addHandler(QueueHandler(log_queue))
     return log_file_path
 
 def load_model_and_config(base_path, weights='models/checkpoints/trainN-20250614_200001-yolov8n-best.pt', data_yaml='configs/data.yaml', imgsz=640, device=''):
@@ -28,33 +44,56 @@ def validate_model(model, data_config, base_path, imgsz=640, device=''):
     results = model.val(data=str(Path(base_path) / 'configs/data.yaml'), imgsz=imgsz, device=device)
     return results
 
-def visualize_time_stats(results, base_path):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+def draw_speed_bars(time_stats, save_path, width=480, height=320, margin=40):
+    # speed 为 {阶段: 毫秒} 的标量字典, 直接用Pillow绘制柱状图, 避免导入matplotlib
+    labels = list(time_stats.keys())
+    values = np.asarray([float(time_stats[k]) for k in labels])
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    plot_h = height - 2 * margin
+    slot_w = (width - 2 * margin) / max(len(labels), 1)
+    heights = values / values.max() * plot_h if values.size and values.max() > 0 else np.zeros_like(values)
+    for i, (label, value, bar_h) in enumerate(zip(labels, values, heights)):
+        x0 = margin + i * slot_w + slot_w * 0.2
+        x1 = margin + (i + 1) * slot_w - slot_w * 0.2
+        y1 = height - margin
+        draw.rectangle([x0, y1 - bar_h, x1, y1], fill=(70, 130, 180))
+        draw.text((x0, y1 + 5), label, fill='black')
+        draw.text((x0, y1 - bar_h - 15), f'{value:.2f}ms', fill='black')
+    draw.line([margin, height - margin, width - margin, height - margin], fill='black')
+    image.save(save_path)
+
+def visualize_time_stats(results, base_path, timestamp):
     validation_dir = Path(base_path) / 'runs/val' / f'validationN-{timestamp}'
     validation_dir.mkdir(parents=True, exist_ok=True)
     time_stats = results[0].speed
-    plt.plot(time_stats['preprocess'], label='Preprocess')
-    plt.plot(time_stats['inference'], label='Inference')
-    plt.plot(time_stats['postprocess'], label='Postprocess')
-    plt.xlabel('Batch')
-    plt.ylabel('Time (ms)')
-    plt.legend()
     time_stats_path = validation_dir / 'time_stats.png'
-    plt.savefig(time_stats_path)
+    if all(isinstance(v, (int, float)) for v in time_stats.values()):
+        draw_speed_bars(time_stats, time_stats_path)
+    else:
+        import matplotlib.pyplot as plt
+        plt.plot(time_stats['preprocess'], label='Preprocess')
+        plt.plot(time_stats['inference'], label='Inference')
+        plt.plot(time_stats['postprocess'], label='Postprocess')
+        plt.xlabel('Batch')
+        plt.ylabel('Time (ms)')
+        plt.legend()
+        plt.savefig(time_stats_path)
     logging.info(f"Saved time stats visualization to {time_stats_path}")
 
 def yolo_val():
     base_path = 'MedicalYOLO'
-    log_file_path = setup_logging(base_path)
+    # 整个运行只生成一次时间戳, 保证日志与输出目录名一致
+    run_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file_path = setup_logging(base_path, run_ts)
     model, data_config = load_model_and_config(base_path)
     logging.info("Validation started")
     results = validate_model(model, data_config, base_path)
     logging.info(f"Validation results: mAP@50={results[0].metrics.box.map50}, mAP@50:95={results[0].metrics.box.map}, Precision={results[0].metrics.box.p}, Recall={results[0].metrics.box.r}")
     print(f"mAP@50={results[0].metrics.box.map50}, mAP@50:95={results[0].metrics.box.map}, Precision={results[0].metrics.box.p}, Recall={results[0].metrics.box.r}")
-    visualize_time_stats(results, base_path)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_log_file_name = f'valN-{timestamp}-yolov8n.log'
-    new_log_file_path = Path(base_path) / 'logging' / 'val' / new_log_file_name
+    visualize_time_stats(results, base_path, run_ts)
+    new_log_file_name = f'valN-{run_ts}-yolov8n.log'
+    new_log_file_path = log_file_path.with_name(new_log_file_name)
     os.rename(log_file_path, new_log_file_path)
     logging.info(f"Log renamed: {new_log_file_name}")
 
@@ -6,18 +6,18 @@
 # @Project   :BTD
 # @Function  :实现数据集的转换,分割，配置文件生成
 import argparse
+import os
 import sys
 import yaml
 import shutil
 import logging
 from pathlib import Path
 
-current_path = Path(__file__).parent.parent.resolve()
-utils_path = current_path / 'utils'
-if str(current_path) not in sys.path:
-    sys.path.insert(0, str(current_path))
-if str(utils_path) not in sys.path:
-    sys.path.insert(1, str(utils_path))
+# 使用字符串路径拼接, 避免 Path.resolve() 逐级 stat 父目录
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _index, _path in enumerate((_ROOT, os.path.join(_ROOT, 'utils'))):
+    if _path not in sys.path:
+        sys.path.insert(_index, _path)
 
 from sklearn.model_selection import train_test_split  #  pip install scikit-learn
 
@@ -130,18 +130,24 @@ class YOLODatasetProcessor:
             return []
 
         matching_pairs = []
-        img_extensions = [".jpg", ".jpeg", ".png", "bmp", ".tiff", ".webp"]
+        img_extensions = [".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".webp"]
+        ext_rank = {ext: i for i, ext in enumerate(img_extensions)}
+
+        # 一次遍历原始图像目录, 建立 stem -> 图像路径 的映射, 同名时按扩展名优先级保留; 扩展名不区分大小写
+        image_files = {}
+        for image_path in self.raw_images_path.iterdir():
+            rank = ext_rank.get(image_path.suffix.lower())
+            if rank is None:
+                continue
+            current = image_files.get(image_path.stem)
+            if current is None or rank < ext_rank[current.suffix.lower()]:
+                image_files[image_path.stem] = image_path
 
         for txt_file in txt_files:
-            found_image = False
-            for ext in img_extensions:
-                img_name_stem = txt_file.stem
-                image_path = self.raw_images_path / (img_name_stem + ext)
-                if image_path.exists():
-                    matching_pairs.append((image_path, txt_file))
-                    found_image = True
-                    break
-            if not found_image:
+            image_path = image_files.get(txt_file.stem)
+            if image_path is not None:
+                matching_pairs.append((image_path, txt_file))
+            else:
                 logger.warning(f"未在 '{self.raw_images_path.relative_to(self.project_root_path)}' "
                             f"中找到匹配的图像文件: '{txt_file.name}'，跳过该标签文件")
         if not matching_pairs:
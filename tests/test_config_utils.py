@@ -0,0 +1,80 @@
+import math
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+try:
+    import torch  # utils.configs 在导入时依赖 torch
+except ImportError:
+    torch = None
+
+if torch is not None:
+    from utils import config_utils
+    from utils.config_utils import auto_type
+
+
+@unittest.skipIf(torch is None, "未安装torch")
+class AutoTypeTest(unittest.TestCase):
+
+    def test_numbers(self):
+        self.assertEqual(auto_type("7"), 7)
+        self.assertIsInstance(auto_type("7"), int)
+        self.assertEqual(auto_type("0.5"), 0.5)
+        self.assertEqual(auto_type("1e-3"), 1e-3)
+
+    def test_whitespace_is_ignored(self):
+        self.assertEqual(auto_type(" 7"), 7)
+        self.assertEqual(auto_type("0.01 "), 0.01)
+
+    def test_underscore_separators(self):
+        self.assertEqual(auto_type("1_000"), 1000)
+        self.assertEqual(auto_type("1_000.5"), 1000.5)
+
+    def test_inf_and_nan(self):
+        self.assertEqual(auto_type("inf"), math.inf)
+        self.assertEqual(auto_type("-Infinity"), -math.inf)
+        self.assertTrue(math.isnan(auto_type("nan")))
+
+    def test_constants_and_lists(self):
+        self.assertIsNone(auto_type("None"))
+        self.assertIs(auto_type("True"), True)
+        self.assertEqual(auto_type("1"), 1)
+        self.assertEqual(auto_type("0,1, 2"), [0, 1, 2])
+
+    def test_non_numeric_strings_unchanged(self):
+        for val in ("abc", "1.2.3", ".", "cuda:0"):
+            self.assertEqual(auto_type(val), val)
+
+
+@unittest.skipIf(torch is None, "未安装torch")
+class MergeGeneratedConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        # 模板生成到临时目录, 不覆盖项目 configs 下的配置文件
+        self._tmp = tempfile.TemporaryDirectory()
+        self._orig_dir = config_utils.CONFIGS_DIR
+        config_utils.CONFIGS_DIR = Path(self._tmp.name)
+
+    def tearDown(self):
+        config_utils.CONFIGS_DIR = self._orig_dir
+        self._tmp.cleanup()
+
+    def _merge_template(self, mode):
+        config_utils.generate_default_config(mode)
+        return config_utils.merge_configs(mode, yaml_config=config_utils.load_config(mode))
+
+    def test_val_template_classes_is_none(self):
+        yolo_args, project_args = self._merge_template("val")
+        self.assertIsNone(yolo_args.classes)
+        self.assertIsNone(project_args.classes)
+
+    def test_infer_template_classes_is_none(self):
+        yolo_args, _ = self._merge_template("infer")
+        self.assertIsNone(yolo_args.classes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,10 +8,15 @@
 """
 
 import logging
+import os
+import pickle
 import yaml
 import sys
 import copy
+import functools
+import re
 from pathlib import Path
+from types import MappingProxyType, SimpleNamespace
 # from datetime import datetime
 
 # # 日志目录和文件设置
@@ -43,14 +48,73 @@ from utils.configs import (
 )
 from utils.paths import CONFIGS_DIR, RUNS_DIR
 
+# 优先使用 LibYAML 实现的 C 解析器, 未编译 LibYAML 时回退到纯 Python 版本
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 logger = logging.getLogger(__name__)
 
 SUPPORTED_CONFIG_TYPES = {"train", "val", "infer"}
-YOLO_VALID_ARGS = {
-    "train": set(DEFAULT_TRAIN_CONFIG.keys()),
-    "val": set(DEFAULT_VAL_CONFIG.keys()),
-    "infer": set(DEFAULT_INFER_CONFIG.keys()),
+
+# 默认配置以只读视图保存, merge_configs 中 dict() 浅拷贝即可得到可写副本, 无需 deepcopy
+_DEFAULT_CONFIGS = {
+    "train": MappingProxyType(DEFAULT_TRAIN_CONFIG),
+    "val": MappingProxyType(DEFAULT_VAL_CONFIG),
+    "infer": MappingProxyType(DEFAULT_INFER_CONFIG),
+}
+_COMMENTED_CONFIGS = {
+    "train": COMMENTED_TRAIN_CONFIG,
+    "val": COMMENTED_VAL_CONFIG,
+    "infer": COMMENTED_INFER_CONFIG,
 }
+YOLO_VALID_ARGS = {mode: frozenset(config) for mode, config in _DEFAULT_CONFIGS.items()}
+
+def _try_pickle_cache(yaml_path: Path):
+    """
+    读取YAML文件, 解析结果以pickle形式缓存在同级 .cache 目录下, 源文件修改时间或大小变化后缓存自动失效
+    配置文件由用户自己维护, 反序列化本地缓存是安全的
+    :param yaml_path: YAML文件路径
+    :return: 解析后的配置内容
+    """
+    st = yaml_path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    cache_file = yaml_path.parent / ".cache" / f"{yaml_path.stem}.{hash(key) & 0xFFFFFFFFFFFFFFFF:016x}.pkl"
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug(f"读取配置缓存失败, 重新解析YAML: {cache_file}, 错误: {e}")
+
+    with open(yaml_path, 'r', encoding='utf-8') as f:
+        config = yaml.load(f, Loader=SafeLoader)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换, 避免并发进程读到写了一半的缓存
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+        # 清理同一配置文件的过期缓存
+        for stale in cache_file.parent.glob(f"{yaml_path.stem}.*.pkl"):
+            if stale != cache_file:
+                stale.unlink(missing_ok=True)
+    except OSError as e:
+        logger.debug(f"写入配置缓存失败: {cache_file}, 错误: {e}")
+    return config
+
+@functools.lru_cache(maxsize=64)
+def _load_cached(path_str: str, mtime_ns: int, size: int):
+    """
+    进程内配置缓存, 键含修改时间和文件大小, 文件被修改后自动失效
+    返回只读视图, 防止调用方意外修改缓存内容
+    """
+    logger.info(f"正在加载配置文件: {path_str}")
+    config = _try_pickle_cache(Path(path_str))
+    return MappingProxyType(config) if isinstance(config, dict) else config
 
 def generate_default_config(config_type: str):
     """
@@ -58,13 +122,8 @@ def generate_default_config(config_type: str):
     :param config_type: 配置文件类型
     """
     config_path = CONFIGS_DIR / f"{config_type}.yaml"
-    if config_type == 'train':
-        config = COMMENTED_TRAIN_CONFIG
-    elif config_type == 'val':
-        config = COMMENTED_VAL_CONFIG
-    elif config_type == 'infer':
-        config = COMMENTED_INFER_CONFIG
-    else:
+    config = _COMMENTED_CONFIGS.get(config_type)
+    if config is None:
         logger.error(f"未知的配置文件类型: {config_type}")
         raise ValueError(f"配置文件类型错误: {config_type}, 目前仅支持train, val, infer三种模式")
     try:
@@ -100,11 +159,13 @@ def load_config(config_type: str = 'train') -> dict:
             raise ValueError(f"配置文件类型错误: {config_type}, 目前仅支持train, val, infer三种模式")
     # 加载配置文件
     try:
-        logger.info(f"正在加载配置文件: {config_path}")
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        st = config_path.stat()
+        cached = _load_cached(str(config_path.resolve()), st.st_mtime_ns, st.st_size)
         logger.info(f"已加载配置文件: {config_path}")
-        return config
+        # 深拷贝后再返回, 调用方修改返回值不会污染缓存
+        if isinstance(cached, MappingProxyType):
+            return copy.deepcopy(dict(cached))
+        return copy.deepcopy(cached)
     except yaml.YAMLError as e:
         logger.error(f"解析配置文件({config_path})失败: {e}")
         raise
@@ -119,21 +180,29 @@ def str2bool(v):
         return v.lower() in ("yes", "true", "t", "1")
     return bool(v)
 
+# 数值格式预判: 覆盖 int()/float() 接受的写法(下划线分隔、科学计数法、inf/nan), 明显不是数字的字符串不再走 try/except
+_NUM_RE = re.compile(r"[+-]?(?:[\d_.]+(?:[eE][+-]?[\d_]+)?|inf(?:inity)?|nan)", re.IGNORECASE)
+# 常量字符串一次字典查找; "1"/"0" 不在表中, 保持按整数解析, 避免 epochs=1 之类被转成布尔值
+_CONST_MAP = {"true": True, "false": False, "yes": True, "no": False, "none": None}
+
 def auto_type(val):
-    # 尝试将字符串转换为 int、float、bool、None 或列表
-    if isinstance(val, str):
-        if val.lower() == "none":
-            return None
-        if val.lower() in ("true", "false"):
-            return str2bool(val)
+    # 尝试将字符串转换为 int、float、bool、None 或列表, 非字符串直接返回; 首尾空白不影响类型判断
+    if not isinstance(val, str):
+        return val
+    stripped = val.strip()
+    lowered = stripped.lower()
+    if lowered in _CONST_MAP:
+        return _CONST_MAP[lowered]
+    if _NUM_RE.fullmatch(stripped):
         try:
-            return int(val)
+            return int(stripped)
         except ValueError:
             try:
-                return float(val)
+                return float(stripped)
             except ValueError:
-                if "," in val:
-                    return [auto_type(x.strip()) for x in val.split(",")]
+                pass
+    if "," in val:
+        return [auto_type(x.strip()) for x in val.split(",")]
     return val
 
 def merge_configs(
@@ -153,30 +222,22 @@ def merge_configs(
     if mode not in YOLO_VALID_ARGS:
         raise ValueError(f"不支持的模式: {mode}")
     valid_args = YOLO_VALID_ARGS[mode]
-    if mode == "train":
-        default_config = copy.deepcopy(DEFAULT_TRAIN_CONFIG)
-    elif mode == "val":
-        default_config = copy.deepcopy(DEFAULT_VAL_CONFIG)
-    elif mode == "infer":
-        default_config = copy.deepcopy(DEFAULT_INFER_CONFIG)
-    else:
-        raise NotImplementedError(f"暂未实现 {mode} 的默认参数")
-
-    project_args = type('Args', (), {})()
-    yolo_args = type('Args', (), {})()
-    merged_params = copy.deepcopy(default_config)
-
-    # 1. 合并 YAML 参数
+    # 默认配置只包含标量值, 浅拷贝即可保证不修改模块级默认字典
+    merged_params = dict(_DEFAULT_CONFIGS[mode])
+
+    # 记录由命令行指定的参数名
+    specified = set()
+
+    # 1. 合并 YAML 参数, 已带类型的值直接使用; 仍为字符串的值(如模板中写出的 classes: None)再做类型推断
     if use_yaml and yaml_config:
-        for k, v in yaml_config.items():
-            merged_params[k] = auto_type(v)
+        merged_params.update({k: auto_type(v) if isinstance(v, str) else v for k, v in yaml_config.items()})
 
-    # 2. 合并命令行参数（最高优先级）
+    # 2. 合并命令行参数（最高优先级）, 只对字符串值做类型推断
     if args is not None:
         for k, v in vars(args).items():
             if v is not None and k != "extra_args":
-                merged_params[k] = auto_type(v)
-                setattr(project_args, f"{k}_specified", True)
+                merged_params[k] = auto_type(v) if isinstance(v, str) else v
+                specified.add(k)
         # 处理 extra_args
         if hasattr(args, "extra_args") and args.extra_args:
             extra = args.extra_args
@@ -185,33 +246,37 @@ def merge_configs(
             for i in range(0, len(extra), 2):
                 key, value = extra[i], extra[i + 1]
                 merged_params[key] = auto_type(value)
-                setattr(project_args, f"{key}_specified", True)
-
-    # 3. 路径标准化
-    if "data" in merged_params and merged_params["data"]:
-        data_path = Path(merged_params["data"])
-        if not data_path.is_absolute():
-            data_path = CONFIGS_DIR / data_path
-        merged_params["data"] = str(data_path)
-        if not data_path.exists():
-            logger.warning(f"数据文件不存在: {data_path}")
-    if "project" in merged_params and merged_params["project"]:
-        project_path = Path(merged_params["project"])
-        if not project_path.is_absolute():
-            project_path = RUNS_DIR / project_path
-        merged_params["project"] = str(project_path)
+                specified.add(key)
+
+    # 3. 路径标准化, 直接用 os.path 处理字符串, 避免构造 Path 对象
+    # data 路径只 stat 一次, 结果在第5步验证中复用
+    data = merged_params.get("data")
+    data_exists = False
+    if data:
+        data = str(data)
+        if not os.path.isabs(data):
+            data = os.path.join(str(CONFIGS_DIR), data)
+        merged_params["data"] = data
+        try:
+            os.stat(data)
+            data_exists = True
+        except OSError:
+            logger.warning(f"数据文件不存在: {data}")
+    project = merged_params.get("project")
+    if project:
+        project = str(project)
+        if not os.path.isabs(project):
+            project = os.path.join(str(RUNS_DIR), project)
+        merged_params["project"] = project
         try:
-            project_path.mkdir(parents=True, exist_ok=True)
+            os.makedirs(project, exist_ok=True)
         except Exception as e:
-            logger.warning(f"无法创建项目目录: {project_path}, 错误: {e}")
+            logger.warning(f"无法创建项目目录: {project}, 错误: {e}")
 
-    # 4. 分离 yolo_args 和 project_args
-    for k, v in merged_params.items():
-        setattr(project_args, k, v)
-        if k in valid_args:
-            setattr(yolo_args, k, v)
-        if not hasattr(project_args, f"{k}_specified"):
-            setattr(project_args, f"{k}_specified", False)
+    # 4. 分离 yolo_args 和 project_args, 用 SimpleNamespace 一次性构建, 不再为每次调用创建匿名类
+    project_args = SimpleNamespace(**{**merged_params,
+                                      **{f"{k}_specified": k in specified for k in merged_params}})
+    yolo_args = SimpleNamespace(**{k: v for k, v in merged_params.items() if k in valid_args})
 
     # 5. 参数验证
     if mode == "train":
@@ -221,7 +286,7 @@ def merge_configs(
             raise ValueError("imgsz 必须为8的倍数")
         if project_args.batch is not None and (not isinstance(project_args.batch, int) or project_args.batch <= 0):
             raise ValueError("batch 必须为正整数或 None")
-        if not Path(project_args.data).exists():
+        if not data_exists:
             raise ValueError(f"data 文件不存在: {project_args.data}")
 
     return yolo_args, project_args
@@ -6,6 +6,13 @@ import time
 from datetime import datetime
 from performance_utils import time_it
 
+try:
+    from PIL import Image
+    _HAS_PIL = True
+except ImportError:
+    Image = None
+    _HAS_PIL = False
+
 
 def setup_logging(base_path, log_type='project_init', temp_log=True):
     log_dir = Path(base_path) / 'logging' / log_type
@@ -70,13 +77,13 @@ def create_directory_structure(base_path):
     for directory in directories:
         try:
             full_path = Path(base_path) / directory
-            if full_path.exists():
-                logging.info(f"✅ 目录已存在: {directory}")
-                existed_count += 1
-            else:
-                full_path.mkdir(parents=True, exist_ok=True)
-                logging.info(f"🆕 创建新目录: {directory}")
-                created_count += 1
+            # 直接尝试创建, 由 FileExistsError 判断已存在, 省去一次 stat 且没有检查与创建之间的竞争
+            full_path.mkdir(parents=True, exist_ok=False)
+            logging.info(f"🆕 创建新目录: {directory}")
+            created_count += 1
+        except FileExistsError:
+            logging.info(f"✅ 目录已存在: {directory}")
+            existed_count += 1
         except Exception as e:
             logging.error(f"❌ 创建目录失败: {directory} - 错误: {str(e)}")
             problem_count += 1
@@ -330,24 +337,22 @@ def check_data_status(base_path):
                       if f.suffix.lower() in image_extensions]
         image_count = len(image_files)
         
-        if image_count > 0:
-            # 检查图像尺寸分布
-            try:
-                from PIL import Image
-                sizes = []
-                for img_file in image_files[:10]:  # 只检查前10张
-                    try:
-                        with Image.open(img_file) as img:
-                            sizes.append(img.size)
-                    except:
-                        continue
-                
-                if sizes:
-                    avg_width = sum(s[0] for s in sizes) / len(sizes)
-                    avg_height = sum(s[1] for s in sizes) / len(sizes)
-                    logging.info(f"📏 图像平均尺寸: {avg_width:.0f}x{avg_height:.0f}")
-            except ImportError:
-                logging.warning("⚠️ 未安装PIL，无法检查图像尺寸")
+        if image_count > 0 and not _HAS_PIL:
+            logging.warning("⚠️ 未安装PIL，无法检查图像尺寸")
+        elif image_count > 0:
+            # 检查图像尺寸分布, Image.open 只解析文件头, 读取 size 不会解码像素数据
+            sizes = []
+            for img_file in image_files[:10]:  # 只检查前10张
+                try:
+                    with Image.open(img_file) as img:
+                        sizes.append(img.size)
+                except Exception:
+                    continue
+
+            if sizes:
+                avg_width = sum(s[0] for s in sizes) / len(sizes)
+                avg_height = sum(s[1] for s in sizes) / len(sizes)
+                logging.info(f"📏 图像平均尺寸: {avg_width:.0f}x{avg_height:.0f}")
     
     # 检查标注文件
     annotation_count = 0
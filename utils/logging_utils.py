@@ -5,17 +5,101 @@
 # @Author    :雨霓同学
 # @Project   :MedicalYOLO
 # @Function  :日志相关的工具类函数
+import atexit
 import logging
-from datetime import datetime
+import logging.handlers
+import queue
+import re
+import time
+from collections import namedtuple
 from pathlib import Path
 
+# 文件与控制台格式器在模块级创建一次, 所有 logger 共用, 避免每次调用重复解析格式串
+_FILE_FMT = logging.Formatter("%(asctime)s - %(levelname)s - %(name)s : %(message)s")
+_CONSOLE_FMT = _FILE_FMT
+# 日志文件名中的时间戳, 如 20250626-153000
+_TS_RE = re.compile(r"(\d{8}[-_]\d{6})")
+
+# log_parameters 中每个参数的取值与来源
+_Param = namedtuple("_Param", "value source")
+_DEFAULT_EXCLUDED_PARAMS = frozenset({'log_encoding', 'use_yaml', 'log_level', 'extra_args'})
+_SPECIFIED_LEN = len("_specified")
+
+class _BufferedFileHandler(logging.FileHandler):
+    """
+    带64KB写缓冲的文件处理器, 不在每条日志后 flush, 而是累计一定条数或间隔一定时间后再写入磁盘;
+    ERROR 及以上级别的日志立即写入. 只配合 _FlushingQueueListener 使用, 队列清空时由监听线程写盘,
+    保证日志空闲后不会一直停留在缓冲区中
+    """
+    buffer_size = 64 * 1024
+    flush_records = 256
+    flush_interval = 1.0
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False, errors=None):
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._deferring = False
+        super().__init__(filename, mode, encoding, delay, errors)
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+
+    def flush(self):
+        # StreamHandler.emit 每条日志都会调用 flush, 此时跳过, 由 emit 按条数/时间决定何时真正写盘
+        if self._deferring:
+            return
+        super().flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def emit(self, record):
+        self._deferring = True
+        try:
+            super().emit(record)
+        finally:
+            self._deferring = False
+        self._pending += 1
+        if (record.levelno >= logging.ERROR or self._pending >= self.flush_records
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+
+class _FlushingQueueListener(logging.handlers.QueueListener):
+    """
+    队列中暂无待处理日志时 flush 所有处理器: 连续写日志时按条数/时间批量写盘, 一旦空闲立即写入磁盘
+    """
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+
+# 每个 logger 名称对应一个后台 QueueListener, 真正的文件/控制台写入在监听线程中完成, 不阻塞调用线程
+_LISTENERS = {}
+
+
+def _stop_listeners():
+    # 进程退出时停止所有监听线程, 确保队列中剩余的日志写入文件
+    for listener in list(_LISTENERS.values()):
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    _LISTENERS.clear()
+
+
+atexit.register(_stop_listeners)
+
 
 def setup_logger(base_path: Path, log_type: str = "general",
                  model_name: str = None,
                  encoding: str = "utf-8",
                  log_level: int = logging.INFO,
                  temp_log: bool = False,
-                 logger_name: str = "YOLO Default"
+                 logger_name: str = "YOLO Default",
+                 timestamp: str = None
                  ):
     """
     配置日志记录器，将日志保存到指定路径的子目录当中，并同时输出到控制台，日志文件名为类型 + 时间戳
@@ -25,6 +109,7 @@ def setup_logger(base_path: Path, log_type: str = "general",
     :param log_level: 日志等级
     :param temp_log: 是否启动临时文件名
     :param logger_name: 日志记录器的名称
+    :param timestamp: 日志文件名使用的时间戳, 为None时使用当前时间
     :return: logging.logger: 返回一个日志记录器实例
     """
     # 1. 构建日志文件完整的存放路径
@@ -32,7 +117,8 @@ def setup_logger(base_path: Path, log_type: str = "general",
     log_dir.mkdir(parents=True, exist_ok=True)
 
     # 2. 生成一个带时间戳的日志文件名
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if timestamp is None:
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
     # 根据temp_log参数，生成不同的日志文件名前缀
     prefix = "temp" if temp_log else log_type.replace(" ", "-")
     log_filename_parts = [prefix, timestamp]
@@ -47,35 +133,54 @@ def setup_logger(base_path: Path, log_type: str = "general",
     logger.setLevel(log_level)
     # 阻止日志事件传播到父级logger
     logger.propagate = False
+    # 记录日志文件名使用的时间戳, 供 rename_log_file 直接使用
+    logger.log_timestamp = timestamp
 
     # 4. 需要避免重复添加日志处理器，因此先检查日志处理器列表中是否已经存在了指定的日志处理器
+    # 先复制列表再遍历, 边遍历边删除会跳过元素; 同时关闭处理器以释放文件句柄
     if logger.handlers:
-        for handler in logger.handlers:
+        for handler in list(logger.handlers):
+            handler.close()
             logger.removeHandler(handler)
+    # 同名 logger 重复初始化时, 先停止旧的监听线程并关闭其文件处理器, 已有的控制台处理器直接复用
+    console_handler = None
+    old_listener = _LISTENERS.pop(logger_name, None)
+    if old_listener is not None:
+        old_listener.stop()
+        for handler in old_listener.handlers:
+            # FileHandler 也是 StreamHandler 的子类, 这里按精确类型区分控制台处理器
+            if console_handler is None and type(handler) is logging.StreamHandler:
+                console_handler = handler
+            else:
+                handler.close()
 
     # 5.创建文件处理器，将日志写入到文件当中
-    file_handler = logging.FileHandler(log_file, encoding=encoding)
-    file_handler.setFormatter(logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(name)s : %(message)s")
-    )
-    # 将文件处理器添加到logger实例中
-    logger.addHandler(file_handler)
+    file_handler = _BufferedFileHandler(log_file, encoding=encoding)
+    file_handler.setFormatter(_FILE_FMT)
 
     # 6.创建控制台处理器，将日志输出到控制台
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(name)s : %(message)s")
-    )
-    # 将控制台处理器添加到logger实例中
-    logger.addHandler(console_handler)
-
-    # 输出一些初始化信息到日志，确认配置成功
-    logger.info(f"日志记录器已启动，日志文件保存在: {log_file}")
-    logger.info(f"日志记录器的根目录: {base_path}")
-    logger.info(f"日志记录器的名称: {logger_name}")
-    logger.info(f"日志记录器的类型: {log_type}")
-    logger.info(f"日志记录器的级别: {logging.getLevelName(log_level)}")
-    logger.info("日志记录器初始化成功".center(60, "="))
+    if console_handler is None:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(_CONSOLE_FMT)
+
+    # 7. logger 上只挂 QueueHandler, 文件和控制台处理器由后台 QueueListener 驱动
+    log_queue = queue.Queue(-1)
+    listener = _FlushingQueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    _LISTENERS[logger_name] = listener
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    # 输出一些初始化信息到日志，确认配置成功; 合并为一条多行日志, 只经过一次格式化与写入
+    if logger.isEnabledFor(logging.INFO):
+        banner = "\n".join((
+            f"日志记录器已启动，日志文件保存在: {log_file}",
+            f"日志记录器的根目录: {base_path}",
+            f"日志记录器的名称: {logger_name}",
+            f"日志记录器的类型: {log_type}",
+            f"日志记录器的级别: {logging.getLevelName(log_level)}",
+            "日志记录器初始化成功".center(60, "="),
+        ))
+        logger.info("%s", banner)
     return logger
 
 def log_parameters(args, exclude_params=None, logger=None):
@@ -88,21 +193,23 @@ def log_parameters(args, exclude_params=None, logger=None):
         logger: 日志记录器实例
 
     Returns:
-        dict: 参数字典
+        dict: 参数字典, 值为 _Param(value, source)
     """
     if logger is None:
         logger = logging.getLogger("YOLO_Training")
-    if exclude_params is None:
-        exclude_params = ['log_encoding', 'use_yaml', 'log_level', 'extra_args']
+    excluded = _DEFAULT_EXCLUDED_PARAMS if exclude_params is None else frozenset(exclude_params)
     logger.info("开始模型参数信息".center(40, "="))
     logger.info("Parameters")
     logger.info("-" * 40)
+    args_vars = vars(args)
+    # 一次扫描收集由命令行指定的参数名, 不再逐个 getattr 查询 *_specified
+    specified = {k[:-_SPECIFIED_LEN] for k, v in args_vars.items() if k.endswith("_specified") and v}
     params_dict = {}
-    for key, value in vars(args).items():
-        if key not in exclude_params and not key.endswith('_specified'):
-            source = '命令行' if getattr(args, f"{key}_specified", False) else 'YAML'
-            logger.info(f"{key:<20}: {value} （来源: [{source}]）")
-            params_dict[key] = {"value": value, "source": source}
+    for key, value in args_vars.items():
+        if key not in excluded and not key.endswith('_specified'):
+            source = '命令行' if key in specified else 'YAML'
+            logger.info("%-20s: %s （来源: [%s]）", key, value, source)
+            params_dict[key] = _Param(value, source)
     return params_dict
 
 def rename_log_file(logger_obj, save_dir, model_name, encoding="utf-8"):
@@ -114,58 +221,65 @@ def rename_log_file(logger_obj, save_dir, model_name, encoding="utf-8"):
     :param encoding: 文件编码
     :return: 新日志文件路径或None
     """
-    for handler in list(logger_obj.handlers):
-        if isinstance(handler, logging.FileHandler):
-            old_log_file = Path(handler.baseFilename)
-            # 解析时间戳
-            timestamp = ""
-            # 支持 temp-20250626-153000-xxx.log 或 xxx_20250626-153000.log
-            if "-" in old_log_file.stem:
-                timestamp_parts = old_log_file.stem.split("-")
-                if len(timestamp_parts) >= 3 and timestamp_parts[0] == "temp":
-                    timestamp = f"{timestamp_parts[1]}-{timestamp_parts[2]}"
-                else:
-                    timestamp = "-".join(timestamp_parts[1:3]) if len(timestamp_parts) > 2 else timestamp_parts[-1]
-            elif "_" in old_log_file.stem:
-                timestamp_parts = old_log_file.stem.split("_")
-                if len(timestamp_parts) > 1:
-                    timestamp = timestamp_parts[1]
-            else:
-                logger_obj.warning(
-                    f"无法从日志文件名({old_log_file.name})中获取时间戳, "
-                    f"请检查日志文件名是否正确"
-                )
-                continue
-            train_prefix = Path(save_dir).name
-            new_log_file = old_log_file.parent / f"{train_prefix}_{timestamp}_{model_name}.log"
-
-            # 关闭旧的日志处理器
-            handler.close()
-            logger_obj.removeHandler(handler)
-
-            if old_log_file.exists():
-                try:
-                    old_log_file.rename(new_log_file)
-                    logger_obj.info(f"日志文件已经重命名成功: {new_log_file}")
-                except OSError as e:
-                    logger_obj.error(f"日志文件重命名失败: {e}")
-                    # 恢复旧处理器，保证日志不中断
-                    re_added_handler = logging.FileHandler(old_log_file, encoding=encoding)
-                    re_added_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-                    logger_obj.addHandler(re_added_handler)
-                    return old_log_file
-            else:
-                logger_obj.warning(f"尝试重命名的日志文件不存在: {old_log_file}")
-                continue
-
-            # 命名成功处理方案
-            new_handler = logging.FileHandler(new_log_file, encoding=encoding)
-            new_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-            logger_obj.addHandler(new_handler)
-            break
-    else:
+    # setup_logger 创建的 logger 由 QueueListener 持有文件处理器, 其他 logger 直接挂在自身上
+    listener = _LISTENERS.get(logger_obj.name)
+    handlers = listener.handlers if listener is not None else logger_obj.handlers
+    handler = next((h for h in handlers if isinstance(h, logging.FileHandler)), None)
+    if handler is None:
         logger_obj.warning("未找到 FileHandler，无法重命名日志文件。")
         return None
+
+    old_log_file = Path(handler.baseFilename)
+    # setup_logger 创建的 logger 直接带有时间戳; 其他 logger 才从文件名中解析,
+    # 一次正则匹配取出时间戳, 兼容 temp_20250626-153000_xxx.log 与 temp-20250626-153000-xxx.log
+    timestamp = getattr(logger_obj, "log_timestamp", None)
+    if timestamp is None:
+        match = _TS_RE.search(old_log_file.stem)
+        if match is None:
+            logger_obj.warning(
+                "无法从日志文件名(%s)中获取时间戳, 请检查日志文件名是否正确",
+                old_log_file.name
+            )
+            return None
+        timestamp = match.group(1)
+    if not old_log_file.exists():
+        logger_obj.warning("尝试重命名的日志文件不存在: %s", old_log_file)
+        return None
+    train_prefix = Path(save_dir).name
+    new_log_file = old_log_file.parent / f"{train_prefix}_{timestamp}_{model_name}.log"
+
+    # 关闭旧的日志处理器; 监听线程先停止, 把队列中已有的日志写完, 期间新日志暂存在队列中
+    if listener is not None:
+        listener.stop()
+    else:
+        logger_obj.removeHandler(handler)
+    # 先把缓冲区中的日志写入旧文件再关闭, 避免重命名后丢失尾部日志
+    handler.flush()
+    handler.close()
+
+    try:
+        old_log_file.rename(new_log_file)
+        renamed = True
+    except OSError as e:
+        rename_error = e
+        renamed = False
+
+    # 重命名失败时恢复旧处理器，保证日志不中断
+    target_file = new_log_file if renamed else old_log_file
+    # 没有监听线程时无法在空闲时写盘, 使用普通的 FileHandler 逐条写入
+    handler_cls = _BufferedFileHandler if listener is not None else logging.FileHandler
+    new_handler = handler_cls(target_file, encoding=encoding)
+    new_handler.setFormatter(_FILE_FMT)
+    if listener is not None:
+        listener.handlers = tuple(new_handler if h is handler else h for h in listener.handlers)
+        listener.start()
+    else:
+        logger_obj.addHandler(new_handler)
+
+    if not renamed:
+        logger_obj.error("日志文件重命名失败: %s", rename_error)
+        return old_log_file
+    logger_obj.info("日志文件已经重命名成功: %s", new_log_file)
     return new_log_file
 
 if __name__ == "__main__":
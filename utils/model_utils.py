@@ -12,13 +12,37 @@ import shutil
 import os
 import logging
 
-def copy_checkpoint_models(train_dir,model_filename, checkpoint_dir,logger):
+
+def _fast_copy(src_path, dest_path):
+    """
+    优先使用 os.copy_file_range 在内核态完成复制(同一文件系统下支持写时复制), 不支持时回退到 shutil.copy2
+    :param src_path: 源文件路径
+    :param dest_path: 目标文件路径
+    """
+    if os.path.exists(dest_path) and os.path.samefile(src_path, dest_path):
+        raise shutil.SameFileError(f"{src_path} 与 {dest_path} 是同一个文件")
+    try:
+        with open(src_path, "rb") as src, open(dest_path, "wb") as dst:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        if remaining > 0:
+            raise OSError(f"复制不完整, 剩余 {remaining} 字节")
+        shutil.copystat(src_path, dest_path)
+    except (OSError, AttributeError):
+        shutil.copy2(src_path, dest_path)
+
+def copy_checkpoint_models(train_dir,model_filename, checkpoint_dir,logger, date_str=None):
     """
     复制模型到指定的地点
     :param train_dir:
     :param model_filename:
     :param checkpoint_dir:
     :param logger:
+    :param date_str: 检查点文件名中的时间戳, 为None时使用当前时间
     :return:
     """
     if not isinstance(train_dir, Path) or not train_dir.is_dir():
@@ -30,7 +54,8 @@ def copy_checkpoint_models(train_dir,model_filename, checkpoint_dir,logger):
         return
 
     # 准备准备新的模型文件名
-    date_str = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if date_str is None:
+        date_str = datetime.now().strftime("%Y%m%d-%H%M%S")
     base_model_name = Path(model_filename).stem
     train_suffix = train_dir.name
 
@@ -41,7 +66,7 @@ def copy_checkpoint_models(train_dir,model_filename, checkpoint_dir,logger):
             checkpoint_name = f"{train_suffix}_{date_str}_{base_model_name}_{model_type}.pt"
             dest_path = checkpoint_dir / checkpoint_name
             try:
-                shutil.copy2(src_path, dest_path)
+                _fast_copy(src_path, dest_path)
                 logger.info(f"{model_type}模型已经从{src_path}复制到至{dest_path}")
             except FileNotFoundError:
                 logger.warning(f"{model_type}模型不存在")
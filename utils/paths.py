@@ -6,6 +6,7 @@
 # @Project   :MedicalYOLO
 # @Function  :项目路径配置
 
+import os
 from pathlib import Path
 
 # 项目根目录 - 需要向上一级才是真正的项目根目录
@@ -38,6 +39,6 @@ CHECKPOINTS_DIR = MODELS_DIR / "checkpoints"
 # 预训练模型目录
 PRETRAINED_DIR = MODELS_DIR / "pretrained"
 
-# 确保关键目录存在
+# 确保关键目录存在, exist_ok 时已存在的目录只需一次 stat, 每次导入都检查以便重建被删除的目录
 for directory in [LOGS_DIR, DATA_DIR, MODELS_DIR, CONFIGS_DIR, OUTPUT_DIR, TEMP_DIR, RUNS_DIR, CHECKPOINTS_DIR, PRETRAINED_DIR]:
-    directory.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+    os.makedirs(directory, exist_ok=True)
@@ -8,9 +8,38 @@
 
 import time
 import functools
+import heapq
 import logging
+import operator
 from typing import Callable, Any, Optional, Tuple
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# (下限秒数, 换算倍数, 单位), 按从大到小排列, 取第一个满足下限的单位
+_UNITS = ((1.0, 1.0, "秒"), (1e-3, 1e3, "毫秒"), (1e-6, 1e6, "微秒"), (0.0, 1e9, "纳秒"))
+
+# 预先定义的日志模板, 精度通过 %.*f 的 * 参数传入
+_FMT_ONCE = "⏱️ 函数 '%s%s' 执行时间: %.*f %s"
+_FMT_REPEAT = "⏱️ 函数 '%s%s' 执行 %d 次, 总时间: %.*f %s, 平均时间: %.*f %s"
+_FMT_MANUAL_ONCE = "⏱️ 手动测量函数 '%s' 执行时间: %.*f %s"
+_FMT_MANUAL_REPEAT = "⏱️ 手动测量函数 '%s' 执行 %d 次, 总时间: %.*f %s, 平均时间: %.*f %s"
+
+
+def _pick_unit(seconds: float) -> Tuple[float, str]:
+    """
+    根据秒数选择时间单位
+    :param seconds: 秒数
+    :return: (换算倍数, 单位)
+    """
+    for threshold, scale, unit in _UNITS:
+        if seconds >= threshold:
+            return scale, unit
+    return _UNITS[-1][1], _UNITS[-1][2]
+
 
 def format_time(seconds: float) -> Tuple[float, str]:
     """
@@ -18,14 +47,27 @@ def format_time(seconds: float) -> Tuple[float, str]:
     :param seconds: 秒数
     :return: (格式化后的数值, 单位)
     """
-    if seconds >= 1.0:
-        return seconds, "秒"
-    elif seconds >= 0.001:
-        return seconds * 1000, "毫秒"
-    elif seconds >= 0.000001:
-        return seconds * 1000000, "微秒"
-    else:
-        return seconds * 1000000000, "纳秒"
+    scale, unit = _pick_unit(seconds)
+    return seconds * scale, unit
+
+
+class _LazyArgs:
+    """
+    延迟构建参数字符串, 只有日志真正输出时才对参数调用 repr, 避免大数组/张量的 repr 开销
+    """
+    __slots__ = ("args", "kwargs")
+
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        if not (self.args or self.kwargs):
+            return ""
+        args_str = ", ".join(repr(arg) for arg in self.args)
+        kwargs_str = ", ".join(f"{k}={repr(v)}" for k, v in self.kwargs.items())
+        all_args = [s for s in [args_str, kwargs_str] if s]
+        return f"({', '.join(all_args)})"
 
 
 def time_it(func: Callable = None, *,
@@ -46,61 +88,46 @@ def time_it(func: Callable = None, *,
     def decorator(f: Callable) -> Callable:
         @functools.wraps(f)
         def wrapper(*args, **kwargs):
+            # 日志级别过滤掉 INFO 时测量结果不会输出, 直接执行函数
+            if logger_instance and not logger_instance.isEnabledFor(logging.INFO):
+                return f(*args, **kwargs)
+
             func_name = f.__name__
             
-            # 构建参数信息
-            args_info = ""
-            if show_args and (args or kwargs):
-                args_str = ", ".join(repr(arg) for arg in args)
-                kwargs_str = ", ".join(f"{k}={repr(v)}" for k, v in kwargs.items())
-                all_args = [s for s in [args_str, kwargs_str] if s]
-                args_info = f"({', '.join(all_args)})"
+            # 构建参数信息, 延迟到日志格式化时才执行 repr
+            args_info = _LazyArgs(args, kwargs) if show_args else ""
             
-            # 记录开始时间
-            start_time = time.perf_counter()
+            # 记录开始时间, 使用整数纳秒计时
+            start_ns = time.perf_counter_ns()
             
-            # 执行函数指定次数
-            result = None
-            for i in range(repeat_times):
-                if i == repeat_times - 1:  # 最后一次执行保存结果
-                    result = f(*args, **kwargs)
-                else:
+            # 执行函数指定次数, 前 repeat_times-1 次不保留结果, 最后一次在循环外执行并保存结果
+            if repeat_times > 1:
+                for _ in range(repeat_times - 1):
                     f(*args, **kwargs)
+            result = f(*args, **kwargs)
             
             # 计算执行时间
-            end_time = time.perf_counter()
-            total_time = end_time - start_time
+            total_time = (time.perf_counter_ns() - start_ns) / 1e9
             avg_time = total_time / repeat_times
             
-            # 统一时间单位显示 - 使用更小的单位保持一致性
-            if total_time >= 1.0:
-                # 如果总时间超过1秒，都用秒显示
-                formatted_total_time, total_unit = total_time, "秒"
-                formatted_avg_time, avg_unit = avg_time, "秒"
-            elif total_time >= 0.001:
-                # 如果总时间超过1毫秒，都用毫秒显示
-                formatted_total_time, total_unit = total_time * 1000, "毫秒"
-                formatted_avg_time, avg_unit = avg_time * 1000, "毫秒"
-            else:
-                # 否则都用微秒显示
-                formatted_total_time, total_unit = total_time * 1000000, "微秒"
-                formatted_avg_time, avg_unit = avg_time * 1000000, "微秒"
+            # 统一时间单位显示 - 总时间与平均时间使用同一单位
+            scale, unit = _pick_unit(total_time)
             
-            # 构建日志消息
+            # 构建日志消息, 使用 %-style 模板, 交给 logging 在真正输出时才格式化
             if repeat_times == 1:
-                message = (f"⏱️ 函数 '{func_name}{args_info}' "
-                          f"执行时间: {formatted_avg_time:.{precision}f} {avg_unit}")
+                msg = _FMT_ONCE
+                msg_args = (func_name, args_info, precision, avg_time * scale, unit)
             else:
-                message = (f"⏱️ 函数 '{func_name}{args_info}' "
-                          f"执行 {repeat_times} 次, "
-                          f"总时间: {formatted_total_time:.{precision}f} {total_unit}, "
-                          f"平均时间: {formatted_avg_time:.{precision}f} {avg_unit}")
+                msg = _FMT_REPEAT
+                msg_args = (func_name, args_info, repeat_times,
+                            precision, total_time * scale, unit,
+                            precision, avg_time * scale, unit)
             
             # 输出到日志或控制台
             if logger_instance:
-                logger_instance.info(message)
+                logger_instance.info(msg, *msg_args)
             else:
-                print(f"[TIME_IT] {message}")
+                print("[TIME_IT] " + msg % msg_args)
                 
             return result
         return wrapper
@@ -134,48 +161,41 @@ def measure_execution_time(func: Callable,
     
     func_name = func.__name__
     
-    # 记录开始时间
-    start_time = time.perf_counter()
+    # 记录开始时间, 使用整数纳秒计时
+    start_ns = time.perf_counter_ns()
     
-    # 执行函数指定次数
-    result = None
-    for i in range(repeat_times):
-        if i == repeat_times - 1:  # 最后一次执行保存结果
-            result = func(*args, **kwargs)
-        else:
+    # 执行函数指定次数, 前 repeat_times-1 次不保留结果, 最后一次在循环外执行并保存结果
+    if repeat_times > 1:
+        for _ in range(repeat_times - 1):
             func(*args, **kwargs)
+    result = func(*args, **kwargs)
     
     # 计算执行时间
-    end_time = time.perf_counter()
-    total_time = end_time - start_time
+    total_time = (time.perf_counter_ns() - start_ns) / 1e9
     avg_time = total_time / repeat_times
     
+    # 日志级别过滤掉 INFO 时无需构建日志消息
+    if logger_instance and not logger_instance.isEnabledFor(logging.INFO):
+        return result, avg_time
+
     # 统一时间单位显示
-    if total_time >= 1.0:
-        formatted_total_time, total_unit = total_time, "秒"
-        formatted_avg_time, avg_unit = avg_time, "秒"
-    elif total_time >= 0.001:
-        formatted_total_time, total_unit = total_time * 1000, "毫秒"
-        formatted_avg_time, avg_unit = avg_time * 1000, "毫秒"
-    else:
-        formatted_total_time, total_unit = total_time * 1000000, "微秒"
-        formatted_avg_time, avg_unit = avg_time * 1000000, "微秒"
-    
+    scale, unit = _pick_unit(total_time)
+
     # 构建日志消息
     if repeat_times == 1:
-        message = (f"⏱️ 手动测量函数 '{func_name}' "
-                  f"执行时间: {formatted_avg_time:.{precision}f} {avg_unit}")
+        msg = _FMT_MANUAL_ONCE
+        msg_args = (func_name, precision, avg_time * scale, unit)
     else:
-        message = (f"⏱️ 手动测量函数 '{func_name}' "
-                  f"执行 {repeat_times} 次, "
-                  f"总时间: {formatted_total_time:.{precision}f} {total_unit}, "
-                  f"平均时间: {formatted_avg_time:.{precision}f} {avg_unit}")
+        msg = _FMT_MANUAL_REPEAT
+        msg_args = (func_name, repeat_times,
+                    precision, total_time * scale, unit,
+                    precision, avg_time * scale, unit)
     
     # 输出到日志或控制台
     if logger_instance:
-        logger_instance.info(message)
+        logger_instance.info(msg, *msg_args)
     else:
-        print(f"[TIME_IT] {message}")
+        print("[TIME_IT] " + msg % msg_args)
     
     return result, avg_time
 
@@ -218,35 +238,58 @@ class PerformanceProfiler:
         
         return avg_time
     
-    def get_summary(self) -> str:
-        """获取性能分析摘要"""
-        if not self.results:
-            return "暂无性能分析数据"
+    def _iter_summary_lines(self, top_k: Optional[int] = None):
+        """逐行生成性能分析摘要"""
+        yield "=" * 60
+        yield "性能分析摘要 (按平均执行时间排序)"
+        yield "=" * 60
         
-        summary_lines = ["=" * 60, "性能分析摘要 (按平均执行时间排序)", "=" * 60]
-        
-        # 按平均时间排序
-        sorted_results = sorted(self.results, key=lambda x: x['avg_time'], reverse=True)
+        # 按平均时间排序, 只需要前 top_k 项时用堆选取, 避免对全部结果排序
+        key = operator.itemgetter('avg_time')
+        if top_k is not None and top_k < len(self.results):
+            sorted_results = heapq.nlargest(top_k, self.results, key=key)
+        else:
+            sorted_results = sorted(self.results, key=key, reverse=True)
         
         for i, result in enumerate(sorted_results, 1):
             formatted_time, unit = format_time(result['avg_time'])
-            summary_lines.append(
-                f"{i:2d}. {result['label']:<30} "
-                f"{formatted_time:>8.4f} {unit:<4} "
-                f"(重复{result['repeat_times']}次)"
-            )
+            yield (f"{i:2d}. {result['label']:<30} "
+                   f"{formatted_time:>8.4f} {unit:<4} "
+                   f"(重复{result['repeat_times']}次)")
         
-        summary_lines.append("=" * 60)
-        return "\n".join(summary_lines)
+        yield "=" * 60
+
+    def get_summary(self, top_k: Optional[int] = None) -> str:
+        """
+        获取性能分析摘要
+        :param top_k: 只显示耗时最长的前 top_k 项, 为None时显示全部
+        """
+        if not self.results:
+            return "暂无性能分析数据"
+        return "\n".join(self._iter_summary_lines(top_k))
     
-    def print_summary(self):
+    def print_summary(self, top_k: Optional[int] = None):
         """打印性能分析摘要"""
-        summary = self.get_summary()
-        if self.logger:
-            for line in summary.split('\n'):
-                self.logger.info(line)
-        else:
-            print(summary)
+        if not self.logger:
+            print(self.get_summary(top_k))
+            return
+        if not self.logger.isEnabledFor(logging.INFO):
+            # INFO 级别被过滤时无需构建摘要
+            return
+        if not self.results:
+            self.logger.info("%s", "暂无性能分析数据")
+            return
+        for line in self._iter_summary_lines(top_k):
+            self.logger.info("%s", line)
+
+
+def warmup(func: Callable, *args, **kwargs) -> Any:
+    """
+    在正式测量前先调用一次函数, 把 JIT 编译、缓存加载等首次调用开销排除在测量结果之外
+    :param func: 要预热的函数
+    :return: 函数执行结果
+    """
+    return func(*args, **kwargs)
 
 
 # 使用示例和测试代码
@@ -279,12 +322,17 @@ if __name__ == "__main__":
         time.sleep(0.1)
         return "完成"
     
-    # 示例3: 手动测量
+    # 示例3: 手动测量, 安装了 numba 时用 njit 编译标量循环
     def math_operations(n):
-        result = 0
+        acc = 0.0
         for i in range(n):
-            result += math.sqrt(i + 1)
-        return result
+            acc += math.sqrt(i + 1)
+        return acc
+
+    if njit is not None:
+        math_operations = njit(cache=True)(math_operations)
+    # 首次调用触发编译, 放在测量之外
+    warmup(math_operations, 1)
     
     # 测试函数
     logger.info("开始性能测试")
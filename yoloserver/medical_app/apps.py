@@ -1,6 +1,21 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
 class MedicalAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'medical_app'
+
+    def ready(self):
+        # migrate 等管理命令不需要模型; runserver 自动重载时只在实际处理请求的子进程中加载
+        if sys.argv[0].endswith('manage.py') and len(sys.argv) > 1:
+            if sys.argv[1] != 'runserver':
+                return
+            if '--noreload' not in sys.argv and os.environ.get('RUN_MAIN') != 'true':
+                return
+        # 启动时加载并预热模型, 同时启动批处理线程, 冷启动开销不落在第一个请求上
+        from .views import get_batcher, get_model
+        get_model()
+        get_batcher()
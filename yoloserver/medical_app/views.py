@@ -1,4 +1,14 @@
+import asyncio
+import json
+import logging
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import torch
+from django.http import Http404
 from django.shortcuts import render
 from django.conf import settings
 from django.core.files.storage import FileSystemStorage
@@ -6,25 +16,297 @@ from ultralytics import YOLO
 from pathlib import Path
 import subprocess
 
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:
+    Image = ImageOps = None
+    UnidentifiedImageError = OSError
+
+# 路径和存储对象在导入时解析一次, 请求处理中不再重复读取 settings
+_BASE = Path(settings.BASE_DIR).parent
+MODEL_PATH = _BASE / 'models/checkpoints/trainN-20250614_200001-yolov8n-best.pt'
+STORAGE = FileSystemStorage()
+# 离线导出的 TensorRT INT8 引擎, 存在时优先使用, 例如:
+# yolo export model=<MODEL_PATH> format=engine int8=True data=configs/data.yaml workspace=4 dynamic=True batch=16
+# 动态批处理需要引擎支持批大小 >1, 导出时需带 dynamic=True 和 batch
+ENGINE_PATH = MODEL_PATH.with_suffix('.engine')
+# 无 GPU 部署时使用的 OpenVINO INT8 模型目录, 例如:
+# yolo export model=<MODEL_PATH> format=openvino int8=True data=configs/data.yaml dynamic=True batch=16
+OPENVINO_PATH = MODEL_PATH.parent / f'{MODEL_PATH.stem}_openvino_model'
+# 无 TensorRT 引擎时 GPU 上使用的 FP16 静态形状 ONNX 模型, 导出后重命名为 <权重名>-fp16-static.onnx, 例如:
+# yolo export model=<MODEL_PATH> format=onnx imgsz=640 half=True simplify=True dynamic=False batch=1
+# 与 INT8 量化所需的 FP32 动态形状导出(<权重名>-fp32-dynamic.onnx)使用不同的文件名, 两者不能共用一个文件
+ONNX_PATH = MODEL_PATH.with_name(f'{MODEL_PATH.stem}-fp16-static.onnx')
+# 无 GPU 且没有 OpenVINO 模型时使用的 ONNX Runtime 静态 INT8 模型, 由 scripts/yolo_int8_quantize.py 生成,
+# 同名 .json 中记录了与 FP32 的 mAP 对比, 只有 accepted 为 true 时才启用
+INT8_ONNX_PATH = MODEL_PATH.with_name(f'{MODEL_PATH.stem}-int8.onnx')
+INT8_RECORD_PATH = INT8_ONNX_PATH.with_suffix('.json')
+# 有 GPU 时使用 FP16 推理, 权重与激活的显存带宽减半并走 Tensor Core
+DEVICE_KWARGS = {'device': 0, 'half': True} if torch.cuda.is_available() else {'device': 'cpu'}
+# 不开启 cudnn.benchmark: 动态批处理的批大小在 1~16 之间变化, 每遇到新的批大小都会在请求路径上重新做一次算法搜索
+# 模型输入边长, JPEG 解码时按此尺寸在 DCT 域缩小
+INFER_SIZE = 640
+JPEG_SUFFIXES = {'.jpg', '.jpeg'}
+WARMUP_RUNS = 5
+# 动态批处理的最大批大小, 静态形状的导出模型按其输入的批维度进一步限制
+MAX_BATCH_SIZE = 16
+# 同步视图等待推理结果的最长时间(秒), 避免批处理线程异常时请求无限阻塞
+INFER_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+def _int8_accepted():
+    """
+    INT8 模型存在且量化脚本记录的 mAP 下降在允许范围内
+    """
+    if not INT8_ONNX_PATH.exists():
+        return False
+    try:
+        with open(INT8_RECORD_PATH, 'r', encoding='utf-8') as f:
+            return bool(json.load(f).get('accepted'))
+    except (OSError, ValueError):
+        logger.warning(f"INT8 模型缺少有效的精度对比记录, 不启用: {INT8_RECORD_PATH}")
+        return False
+
+def _select_weights():
+    """
+    按部署环境选择推理权重: GPU 优先 TensorRT 引擎, 其次静态 ONNX; CPU 优先 OpenVINO, 其次 INT8 ONNX; 都不存在时回退到 .pt
+    """
+    if DEVICE_KWARGS['device'] != 'cpu':
+        if ENGINE_PATH.exists():
+            return ENGINE_PATH
+        if ONNX_PATH.exists():
+            return ONNX_PATH
+    elif OPENVINO_PATH.is_dir():
+        return OPENVINO_PATH
+    elif _int8_accepted():
+        return INT8_ONNX_PATH
+    return MODEL_PATH
+
+# 模型在进程内只加载一次, 多个请求共用; 加锁保证多线程 worker 下不会重复加载
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
+
+def get_model():
+    global _MODEL
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            if _MODEL is None:
+                weights = _select_weights()
+                if weights == ENGINE_PATH:
+                    # ultralytics 根据后缀自动选择 TensorRT 后端, 引擎已完成层融合
+                    model = YOLO(str(ENGINE_PATH), task='detect')
+                elif weights == ONNX_PATH:
+                    # 静态形状 ONNX 在 CUDA 上由 ultralytics 做 IO binding, 输出缓冲区只分配一次并在各次调用间复用
+                    model = YOLO(str(ONNX_PATH), task='detect')
+                elif weights == OPENVINO_PATH:
+                    # CPU 上走 OpenVINO INT8 后端, 批大小 >1 时 ultralytics 用异步推理队列并行执行
+                    model = YOLO(str(OPENVINO_PATH), task='detect')
+                elif weights == INT8_ONNX_PATH:
+                    # device='cpu' 时 ultralytics 以 CPUExecutionProvider 运行 QDQ 模型
+                    model = YOLO(str(INT8_ONNX_PATH), task='detect')
+                else:
+                    model = YOLO(str(MODEL_PATH))
+                    # 加载时把 BN 折叠进卷积权重, 每个卷积块少一次 kernel 启动; model.info() 中 BN 层数应为 0
+                    model.fuse()
+                # 预热若干次, 让 CUDA 上下文、cuDNN 算法搜索和 ultralytics 预测器的延迟初始化不落在第一个真实请求上
+                # 走完整的预测流程而不是直接调用 model.model, 对 TensorRT/ONNX/OpenVINO 后端同样有效
+                dummy = np.zeros((INFER_SIZE, INFER_SIZE, 3), dtype=np.uint8)
+                for _ in range(WARMUP_RUNS):
+                    model(dummy, verbose=False, **DEVICE_KWARGS)
+                _MODEL = model
+    return _MODEL
+
+def _backend_max_batch(model):
+    """
+    根据已加载的推理后端确定可接受的最大批大小: .pt 和动态形状导出不受限制,
+    静态形状导出只能使用其输入的批维度 (ONNX 读取输入 shape[0], 其他后端读取导出时记录的 batch)
+    """
+    backend = getattr(model.predictor, 'model', None)
+    if backend is None or getattr(backend, 'pt', False) or getattr(backend, 'dynamic', False):
+        return MAX_BATCH_SIZE
+    session = getattr(backend, 'session', None)
+    if session is not None:
+        dim = session.get_inputs()[0].shape[0]
+        if not isinstance(dim, int) or dim <= 0:
+            # 批维度为符号或 -1 时为动态形状
+            return MAX_BATCH_SIZE
+        return min(dim, MAX_BATCH_SIZE)
+    batch = getattr(backend, 'batch', 1)
+    return min(batch, MAX_BATCH_SIZE) if isinstance(batch, int) and batch > 0 else 1
+
+class _DynamicBatcher:
+    """
+    动态批处理: 后台线程把并发提交的图片合并成一个批次调用一次模型, 攒满 max_batch_size 或等待超过 timeout_ms 即执行
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, timeout_ms=10, **predict_kwargs):
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout_ms / 1000
+        self.predict_kwargs = predict_kwargs
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='yolo-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, source) -> Future:
+        future = Future()
+        self._queue.put((source, future))
+        return future
+
+    def _collect(self):
+        batch = []
+        deadline = None
+        while len(batch) < self.max_batch_size:
+            if deadline is None:
+                item = self._queue.get()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            # 客户端断开后 future 已被取消, 直接丢弃; 标记为运行中后不能再被取消
+            if not item[1].set_running_or_notify_cancel():
+                continue
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.timeout
+        return batch
+
+    def _run(self):
+        # 任何异常都只影响当前批次, 线程本身不能退出, 否则之后的请求都拿不到结果
+        while True:
+            try:
+                self._run_batch(self._collect())
+            except Exception:
+                logger.exception("批处理线程处理批次时发生异常")
+
+    def _run_batch(self, batch):
+        sources = [source for source, _ in batch]
+        # stream=True 逐张产出结果, 每张推理完立即交给对应请求, 不在本线程积攒整批 Results
+        done = 0
+        try:
+            # inference_mode 比 no_grad 更彻底地关闭 autograd 记录; 生成器需在 with 块内消费完
+            with torch.inference_mode():
+                for result in get_model()(sources, batch=len(sources), stream=True, **self.predict_kwargs):
+                    future = batch[done][1]
+                    done += 1
+                    if not future.done():
+                        future.set_result(result)
+        except Exception as e:
+            for _, future in batch[done:]:
+                if not future.done():
+                    future.set_exception(e)
+
+
+_BATCHER = None
+_BATCHER_LOCK = threading.Lock()
+
+
+def get_batcher():
+    global _BATCHER
+    if _BATCHER is None:
+        with _BATCHER_LOCK:
+            if _BATCHER is None:
+                # 推理热路径上不写结果图片和标签文件, 检测框交给前端绘制
+                # 提高置信度阈值并限制最大框数, 减少进入 NMS 的候选框
+                # 静态形状导出(ONNX/TensorRT/OpenVINO)只接受导出时的批大小, 按加载后的后端确定批大小上限
+                max_batch_size = _backend_max_batch(get_model())
+                logger.info(f"动态批处理最大批大小: {max_batch_size}")
+                _BATCHER = _DynamicBatcher(max_batch_size=max_batch_size, timeout_ms=10,
+                                           conf=0.4, iou=0.45, max_det=100,
+                                           save=False, save_txt=False, verbose=False, **DEVICE_KWARGS)
+    return _BATCHER
+
+def _result_payload(result, url):
+    """
+    把单张图片的推理结果转换为模板数据: 原图地址 + 归一化检测框 [x1, y1, x2, y2, conf, cls]
+    归一化坐标与解码时是否缩小无关, 前端按原图尺寸还原
+    """
+    boxes = result.boxes
+    return {
+        'url': url,
+        'boxes': torch.cat([boxes.xyxyn, boxes.conf[:, None], boxes.cls[:, None]], dim=1).cpu().tolist(),
+        'names': result.names,
+    }
+
+def _load_source(path):
+    """
+    在请求线程中解码图片, 避免解码集中在单个批处理线程上串行执行
+    大尺寸 JPEG 用 Pillow 的 draft 模式在 DCT 域直接缩小到不小于模型输入的尺寸, 省去大部分 IDCT 计算
+    所有格式都按 EXIF 方向旋转, 与浏览器显示的原图一致, 前端叠加的归一化检测框才能对齐
+    letterbox 和归一化仍由 ultralytics 完成: 同一批次中的输入类型必须一致, 且 GPU 张量输入会跳过 letterbox,
+    因此不在这里改用 DALI/nvJPEG 输出 GPU 张量; 解码与推理已分别在请求线程和批处理线程上重叠执行
+    """
+    path = Path(path)
+    if Image is None:
+        return str(path)
+    with Image.open(path) as img:
+        if path.suffix.lower() in JPEG_SUFFIXES:
+            img.draft('RGB', (INFER_SIZE, INFER_SIZE))
+        img = ImageOps.exif_transpose(img)
+        if img.mode.startswith(('I', 'F')):
+            return _to_uint8_bgr(np.asarray(img))
+        # ultralytics 把 numpy 输入视为 BGR 顺序
+        return np.ascontiguousarray(np.asarray(img.convert('RGB'))[:, :, ::-1])
+
+def _to_uint8_bgr(arr):
+    """
+    16 位/浮点单通道图像按实际像素范围线性映射到 0~255 并复制为三通道;
+    convert('RGB') 会直接截断超过 255 的像素值, 12/16 位医学影像几乎全白
+    """
+    arr = arr.astype(np.float32)
+    lo, hi = float(arr.min()), float(arr.max())
+    scale = 255.0 / (hi - lo) if hi > lo else 0.0
+    gray = ((arr - lo) * scale).astype(np.uint8)
+    return np.ascontiguousarray(np.repeat(gray[:, :, None], 3, axis=2))
+
+def run_inference(path):
+    """
+    对单张图片推理并返回其结果, 经批处理线程与其他请求合并成批次
+    """
+    return get_batcher().submit(_load_source(path)).result(timeout=INFER_TIMEOUT)
+
+async def run_inference_async(path):
+    """
+    run_inference 的异步版本: 解码放到线程池, 等待推理结果时不占用事件循环
+    与同步版本一样最多等待 INFER_TIMEOUT 秒, 超时后取消该请求的 future, 批处理线程会跳过它
+    """
+    source = await asyncio.to_thread(_load_source, path)
+    return await asyncio.wait_for(asyncio.wrap_future(get_batcher().submit(source)), INFER_TIMEOUT)
+
 def upload_file(request):
     if request.method == 'POST' and request.FILES['myfile']:
         myfile = request.FILES['myfile']
-        fs = FileSystemStorage()
-        filename = fs.save(myfile.name, myfile)
-        uploaded_file_url = fs.url(filename)
-        return render(request, 'upload_success.html', {
-            'uploaded_file_url': uploaded_file_url
+        # 大文件为 TemporaryUploadedFile, FileSystemStorage 会把临时文件直接移动到目标位置, 不经 Python 逐块复制
+        filename = STORAGE.save(myfile.name, myfile)
+        # 只对刚上传的图片推理, 不再重复处理 media 目录中已有的文件
+        try:
+            result = run_inference(STORAGE.path(filename))
+        except (UnidentifiedImageError, OSError, TimeoutError) as e:
+            # 文件已保存, 无法识别的格式(如 DICOM)或推理超时时仍显示上传成功页面, 并给出原因
+            logger.warning(f"上传文件推理失败: {filename}, 错误: {e!r}")
+            return render(request, 'upload_success.html', {
+                'uploaded_file_url': STORAGE.url(filename),
+                'filename': filename,
+                'error_message': f"文件已上传, 但未能完成推理: {e}",
+            })
+        return render(request, 'infer_results.html', {
+            'result_images': [_result_payload(result, STORAGE.url(filename))]
         })
     return render(request, 'upload.html')
 
-def infer_and_display(request):
-    base_path = Path(settings.BASE_DIR).parent
-    model = YOLO(str(base_path / 'models/checkpoints/trainN-20250614_200001-yolov8n-best.pt'))
-    source = str(base_path / 'media')
-    results = model(source, save=True, save_txt=True)
-    result_images = []
-    for result in results:
-        result_images.append(result.save_dir)
+async def infer_and_display(request):
+    # 通过 ?file=<文件名> 对已上传的单张图片重新推理; STORAGE.path 会拒绝越出 MEDIA_ROOT 的路径
+    filename = request.GET.get('file')
+    if not filename:
+        return render(request, 'upload.html')
+    if not STORAGE.exists(filename):
+        raise Http404(f"文件不存在: {filename}")
+    result = await run_inference_async(STORAGE.path(filename))
     return render(request, 'infer_results.html', {
-        'result_images': result_images
-    })
\ No newline at end of file
+        'result_images': [_result_payload(result, STORAGE.url(filename))]
+    })
@@ -1,6 +1,8 @@
 import os
+from pathlib import Path
 
-from yoloserver.yoloserver.settings import BASE_DIR
+# 本文件位于 yoloserver/ 下, 与 yoloserver/yoloserver/settings.py 中的 BASE_DIR 指向同一目录, 无需再导入该模块
+BASE_DIR = Path(__file__).resolve().parent
 
 
 INSTALLED_APPS = [
@@ -12,4 +14,6 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # 允许上传的文件大小限制
-DATA_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
\ No newline at end of file
+DATA_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
+# 超过 1MB 的上传文件写入临时文件而不是留在 worker 内存中, 保存时由存储后端直接 rename 到 MEDIA_ROOT
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1 * 1024 * 1024  # 1MB
\ No newline at end of file